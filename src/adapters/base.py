@@ -3,11 +3,20 @@
 提供统一的接口规范，用于处理不同模型提供商的请求和响应格式转换
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, AsyncGenerator, Optional
+from typing import Dict, Any, AsyncGenerator, Mapping, Optional
+from multidict import CIMultiDict, CIMultiDictProxy
+import secrets
+
+def generate_completion_id() -> str:
+    """生成OpenAI格式的补全ID"""
+    return f"chatcmpl-{secrets.token_hex(12)}"
 
 class ModelAdapter(ABC):
     """模型适配器基类"""
     
+    # 请求头缓存，key为API密钥
+    _headers_cache: Dict[str, CIMultiDictProxy] = {}
+    
     @abstractmethod
     async def prepare_request(
         self,
@@ -54,7 +63,7 @@ class ModelAdapter(ABC):
     async def process_stream(
         self,
         stream_response: AsyncGenerator[bytes, None]
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """
         处理流式响应
         
@@ -62,7 +71,7 @@ class ModelAdapter(ABC):
             stream_response: 原始流式响应
             
         Yields:
-            str: 处理后的SSE格式数据
+            bytes: 处理后的SSE格式数据，已编码为UTF-8
         """
         pass
     
@@ -84,17 +93,24 @@ class ModelAdapter(ABC):
         """
         pass
     
-    def get_headers(self, api_key: str) -> Dict[str, str]:
+    def get_headers(self, api_key: str) -> Mapping[str, str]:
         """
         获取请求头
         
+        同一API密钥的请求头不会变化，首次构建后缓存复用。
+        缓存为只读的 CIMultiDictProxy，aiohttp 可直接使用而无需再次包装
+        
         Args:
             api_key: API密钥
             
         Returns:
-            Dict[str, str]: 请求头字典
+            Mapping[str, str]: 请求头
         """
-        return {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
\ No newline at end of file
+        headers = self._headers_cache.get(api_key)
+        if headers is None:
+            headers = CIMultiDictProxy(CIMultiDict({
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}"
+            }))
+            self._headers_cache[api_key] = headers
+        return headers
\ No newline at end of file
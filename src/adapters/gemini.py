@@ -2,14 +2,16 @@
 Gemini API 适配器
 处理 Google Gemini API 的请求和响应格式转换
 """
-import json
-import uuid
+import orjson
 from typing import Dict, Any, AsyncGenerator, Optional
-from .base import ModelAdapter
+from .base import ModelAdapter, generate_completion_id
 
 class GeminiAdapter(ModelAdapter):
     """Gemini API适配器实现"""
     
+    # 角色名映射，Gemini使用"model"代替"assistant"
+    _ROLE_MAP = {"assistant": "model"}
+    
     async def prepare_request(
         self,
         messages: list[Dict[str, str]],
@@ -20,16 +22,14 @@ class GeminiAdapter(ModelAdapter):
     ) -> Dict[str, Any]:
         """准备Gemini格式的请求数据"""
         # 转换消息格式
-        gemini_messages = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            # Gemini使用"model"代替"assistant"
-            if role == "assistant":
-                role = "model"
-            gemini_messages.append({
-                "role": role,
+        gemini_messages = [
+            {
+                "role": self._ROLE_MAP.get(role, role),
                 "parts": [{"text": msg.get("content", "")}]
-            })
+            }
+            for msg in messages
+            for role in (msg.get("role", "user"),)
+        ]
         
         request_data = {
             "prompt": {
@@ -61,7 +61,7 @@ class GeminiAdapter(ModelAdapter):
         content = candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "")
         
         return {
-            "id": str(uuid.uuid4()),
+            "id": generate_completion_id(),
             "object": "chat.completion",
             "created": response.get("created", 0),
             "model": "gemini",
@@ -83,25 +83,38 @@ class GeminiAdapter(ModelAdapter):
     async def process_stream(
         self,
         stream_response: AsyncGenerator[bytes, None]
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """处理Gemini格式的流式响应"""
+        # 每个分块的响应结构相同，且生成后立即序列化，
+        # 因此整个流复用同一个字典，只更新变化的字段
+        delta = {"content": ""}
+        choice = {"index": 0, "delta": delta, "finish_reason": None}
+        response_data = {
+            # 同一响应的所有分块共享一个ID，只在流开始时生成一次
+            "id": generate_completion_id(),
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gemini",
+            "choices": [choice]
+        }
+        
         async for chunk in stream_response:
             if not chunk:
                 continue
                 
             try:
-                # 解析数据
-                data = chunk.decode("utf-8").strip()
-                if data == "data: [DONE]":
-                    yield data + "\n\n"
-                    continue
-                    
-                if data.startswith("data: "):
+                # 直接在字节上处理，避免逐块解码
+                data = chunk.strip()
+                if data.startswith(b"data: "):
                     data = data[6:]
                     
+                if data == b"[DONE]":
+                    yield b"data: [DONE]\n\n"
+                    continue
+                    
                 # 解析JSON数据
                 try:
-                    chunk_data = json.loads(data)
+                    chunk_data = orjson.loads(data)
                     candidates = chunk_data.get("candidates", [])
                     if not candidates:
                         continue
@@ -109,28 +122,18 @@ class GeminiAdapter(ModelAdapter):
                     # 提取文本内容
                     content = candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "")
                     
-                    # 构建OpenAI格式的响应
-                    response_data = {
-                        "id": str(uuid.uuid4()),
-                        "object": "chat.completion.chunk",
-                        "created": chunk_data.get("created", 0),
-                        "model": "gemini",
-                        "choices": [{
-                            "index": 0,
-                            "delta": {
-                                "content": content
-                            },
-                            "finish_reason": candidates[0].get("finishReason")
-                        }]
-                    }
+                    # 填充OpenAI格式响应中变化的字段
+                    response_data["created"] = chunk_data.get("created", 0)
+                    delta["content"] = content
+                    choice["finish_reason"] = candidates[0].get("finishReason")
                     
-                    yield f"data: {json.dumps(response_data)}\n\n"
+                    yield b"data: " + orjson.dumps(response_data) + b"\n\n"
                     
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     continue
                     
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
     
     async def handle_error(
         self,
@@ -149,7 +152,7 @@ class GeminiAdapter(ModelAdapter):
         if hasattr(error, "response") and hasattr(error.response, "text"):
             try:
                 error_text = error.response.text
-                error_data = json.loads(error_text)
+                error_data = orjson.loads(error_text)
                 if isinstance(error_data, dict):
                     if "error" in error_data:
                         error_response["error"].update(error_data["error"])
@@ -157,7 +160,7 @@ class GeminiAdapter(ModelAdapter):
                         error_response["error"]["message"] = error_data["message"]
                     else:
                         error_response["error"]["message"] = error_text
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 error_response["error"]["message"] = error_text
                 
         return error_response
\ No newline at end of file
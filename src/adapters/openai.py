@@ -2,10 +2,9 @@
 OpenAI 格式适配器
 处理符合 OpenAI API 格式的请求和响应
 """
-import json
-import uuid
+import orjson
 from typing import Dict, Any, AsyncGenerator, Optional
-from .base import ModelAdapter
+from .base import ModelAdapter, generate_completion_id
 
 class OpenAIAdapter(ModelAdapter):
     """OpenAI格式适配器实现"""
@@ -79,7 +78,7 @@ class OpenAIAdapter(ModelAdapter):
             
         # 标准化响应格式
         return {
-            "id": response.get("id", str(uuid.uuid4())),
+            "id": response["id"] if "id" in response else generate_completion_id(),
             "object": response.get("object", "chat.completion"),
             "created": response.get("created", 0),
             "model": response.get("model", "unknown"),
@@ -90,37 +89,46 @@ class OpenAIAdapter(ModelAdapter):
     async def process_stream(
         self,
         stream_response: AsyncGenerator[bytes, None]
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """处理OpenAI格式的流式响应"""
+        # 同一响应的所有分块共享一个ID，只在流开始时生成一次
+        stream_id = generate_completion_id()
+        
         async for chunk in stream_response:
             if not chunk:
                 continue
                 
             try:
-                # 解析数据
-                data = chunk.decode("utf-8").strip()
-                if data == "data: [DONE]":
-                    yield data + "\n\n"
+                # 直接在字节上处理，避免逐块解码
+                data = chunk.strip()
+                if data.startswith(b"data: "):
+                    data = data[6:]  # 移除 "data: " 前缀
+                    
+                if data == b"[DONE]":
+                    yield b"data: [DONE]\n\n"
                     continue
                     
-                if data.startswith("data: "):
-                    data = data[6:]  # 移除 "data: " 前缀
+                # 上游数据以ID字段开头时已是完整的OpenAI格式，原样转发，
+                # 省去一次解析和序列化
+                if data.startswith(b'{"id"'):
+                    yield b"data: " + data + b"\n\n"
+                    continue
                     
                 # 解析JSON数据
                 try:
-                    json_data = json.loads(data)
-                except json.JSONDecodeError:
+                    json_data = orjson.loads(data)
+                except orjson.JSONDecodeError:
                     continue
                     
                 # 确保有正确的ID
                 if "id" not in json_data:
-                    json_data["id"] = str(uuid.uuid4())
+                    json_data["id"] = stream_id
                     
                 # 构建SSE格式响应
-                yield f"data: {json.dumps(json_data)}\n\n"
+                yield b"data: " + orjson.dumps(json_data) + b"\n\n"
                 
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
     
     async def handle_error(
         self,
@@ -139,13 +147,13 @@ class OpenAIAdapter(ModelAdapter):
         if hasattr(error, "response") and hasattr(error.response, "text"):
             try:
                 error_text = error.response.text
-                error_data = json.loads(error_text)
+                error_data = orjson.loads(error_text)
                 if isinstance(error_data, dict):
                     if "error" in error_data:
                         error_response["error"].update(error_data["error"])
                     else:
                         error_response["error"]["message"] = error_text
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 error_response["error"]["message"] = error_text
                 
         return error_response
\ No newline at end of file
@@ -4,11 +4,14 @@ HTTP请求处理器
 """
 from typing import Dict, Any, AsyncGenerator, Union
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from ..router import Router
-from infrastructure.logging import logger
-import time
-import json
+from infrastructure import logging as log
+import logging
+import orjson
+
+# 流结束标记
+_DONE_FRAME = b"data: [DONE]\n\n"
 
 class HTTPHandler:
     """HTTP请求处理器"""
@@ -19,7 +22,7 @@ class HTTPHandler:
     async def handle_chat_completion(
         self,
         request: Request
-    ) -> Union[JSONResponse, StreamingResponse]:
+    ) -> Union[Response, StreamingResponse]:
         """
         处理聊天补全请求
         
@@ -27,26 +30,28 @@ class HTTPHandler:
             request: FastAPI请求对象
             
         Returns:
-            JSONResponse | StreamingResponse: 处理后的响应
+            Response | StreamingResponse: 处理后的响应
             
         Raises:
             HTTPException: 当请求处理出错时
         """
         try:
             # 解析请求
-            payload = await request.json()
+            payload = orjson.loads(await request.body())
             model = payload.get("model")
             if not model:
                 raise ValueError("Model is required")
                 
-            api_key = request.headers.get("authorization", "").replace("Bearer ", "")
+            # 只去掉开头的 "Bearer " 前缀，不扫描整个字符串
+            auth = request.headers.get("authorization", "")
+            api_key = auth[7:] if auth.startswith("Bearer ") else auth
             if not api_key:
                 raise ValueError("API key is required")
                 
             stream = payload.get("stream", False)
             
             # 记录请求开始
-            logger.log_request_start(
+            log.logger.log_request_start(
                 provider="unknown",  # 在路由后更新
                 model=model,
                 messages=payload.get("messages", []),
@@ -67,14 +72,15 @@ class HTTPHandler:
                 payload=payload
             )
             
-            return JSONResponse(content=response)
+            # 直接用 orjson 序列化响应体，不经过 FastAPI 的编码流程
+            return Response(content=orjson.dumps(response), media_type="application/json")
             
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except PermissionError as e:
             raise HTTPException(status_code=401, detail=str(e))
         except Exception as e:
-            logger.log_request_error(
+            log.logger.log_request_error(
                 provider="unknown",
                 model=model if model else "unknown",
                 status_code=500,
@@ -90,34 +96,35 @@ class HTTPHandler:
         model: str,
         api_key: str,
         payload: Dict[str, Any]
-    ) -> AsyncGenerator[str, None]:  # type: ignore
-        """生成流式响应"""
+    ) -> AsyncGenerator[bytes, None]:  # type: ignore
+        """生成流式响应，直接转发路由器输出的字节"""
         try:
             async for chunk in self.router.route_request_stream(model, api_key, payload):
-                if chunk.strip():
-                    logger.log_chunk(chunk=chunk, state="Sending")
-                    yield f"{chunk}\n\n"
-            yield "data: [DONE]\n\n"
+                if chunk and not chunk.isspace():
+                    # 仅在调试级别下才解码并记录分块
+                    if log.logger.logger.isEnabledFor(logging.DEBUG):
+                        log.logger.log_chunk(chunk=chunk.decode("utf-8"), state="Sending")
+                    yield chunk + b"\n\n"
+            yield _DONE_FRAME
             
         except Exception as e:
-            error_chunk = f"data: {json.dumps({'error': str(e)})}\n\n"
-            yield error_chunk
-            yield "data: [DONE]\n\n"
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+            yield _DONE_FRAME
             raise
     
-    async def handle_models_list(self) -> JSONResponse:
+    async def handle_models_list(self) -> Response:
         """
         处理模型列表请求
         
         Returns:
-            JSONResponse: 可用模型列表
+            Response: 可用模型列表，使用路由器缓存的JSON直接作为响应体
         """
         try:
-            models = await self.router.list_models()
-            return JSONResponse(content=models)
+            body = await self.router.list_models_json()
+            return Response(content=body, media_type="application/json")
             
         except Exception as e:
-            logger.log_request_error(
+            log.logger.log_request_error(
                 provider="system",
                 model="none",
                 status_code=500,
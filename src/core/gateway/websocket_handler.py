@@ -5,8 +5,8 @@ WebSocket处理器
 from typing import Dict, Any, Set
 from fastapi import WebSocket, WebSocketDisconnect
 from ..router import Router
-from infrastructure.logging import logger
-import json
+from infrastructure import logging as log
+import orjson
 import asyncio
 from datetime import datetime
 
@@ -30,7 +30,7 @@ class WebSocketHandler:
         self.active_connections[client_id] = websocket
         self.connection_times[client_id] = datetime.now()
         
-        logger.info(f"WebSocket client {client_id} connected")
+        log.logger.logger.info(f"WebSocket client {client_id} connected")
     
     def disconnect(self, client_id: str):
         """
@@ -44,7 +44,7 @@ class WebSocketHandler:
         if client_id in self.connection_times:
             del self.connection_times[client_id]
             
-        logger.info(f"WebSocket client {client_id} disconnected")
+        log.logger.logger.info(f"WebSocket client {client_id} disconnected")
     
     async def handle_message(self, websocket: WebSocket, client_id: str):
         """
@@ -57,7 +57,7 @@ class WebSocketHandler:
         try:
             while True:
                 # 接收消息
-                message = await websocket.receive_json()
+                message = orjson.loads(await websocket.receive_text())
                 
                 # 验证消息格式
                 if not isinstance(message, dict):
@@ -74,7 +74,7 @@ class WebSocketHandler:
         except WebSocketDisconnect:
             self.disconnect(client_id)
         except Exception as e:
-            logger.error(f"WebSocket error for client {client_id}: {str(e)}")
+            log.logger.logger.error(f"WebSocket error for client {client_id}: {str(e)}")
             await self._send_error(websocket, str(e))
     
     async def _handle_chat_message(
@@ -88,7 +88,10 @@ class WebSocketHandler:
             # 验证必要字段
             payload = message.get("payload", {})
             model = payload.get("model")
-            api_key = message.get("api_key", "").replace("Bearer ", "")
+            # 只去掉开头的 "Bearer " 前缀，不扫描整个字符串
+            api_key = message.get("api_key", "")
+            if api_key.startswith("Bearer "):
+                api_key = api_key[7:]
             
             if not model or not api_key:
                 await self._send_error(websocket, "Missing required fields")
@@ -98,7 +101,7 @@ class WebSocketHandler:
             payload["stream"] = True
             
             # 记录请求开始
-            logger.log_request_start(
+            log.logger.log_request_start(
                 provider="unknown",
                 model=model,
                 messages=payload.get("messages", []),
@@ -107,8 +110,8 @@ class WebSocketHandler:
             
             # 处理流式响应
             async for chunk in self.router.route_request_stream(model, api_key, payload):
-                if chunk.strip():
-                    await websocket.send_text(chunk)
+                if chunk and not chunk.isspace():
+                    await websocket.send_text(chunk.decode("utf-8"))
             
             # 发送完成标记
             await websocket.send_text("data: [DONE]\n\n")
@@ -120,7 +123,7 @@ class WebSocketHandler:
                     "type": e.__class__.__name__
                 }
             }
-            await websocket.send_text(f"data: {json.dumps(error_message)}\n\n")
+            await websocket.send_text(f"data: {orjson.dumps(error_message).decode()}\n\n")
             await websocket.send_text("data: [DONE]\n\n")
     
     async def _send_error(self, websocket: WebSocket, message: str):
@@ -131,7 +134,7 @@ class WebSocketHandler:
                 "timestamp": datetime.now().isoformat()
             }
         }
-        await websocket.send_json(error_data)
+        await websocket.send_text(orjson.dumps(error_data).decode())
     
     async def broadcast(self, message: str):
         """
@@ -140,17 +143,19 @@ class WebSocketHandler:
         Args:
             message: 要广播的消息
         """
-        disconnected_clients = set()
+        # 先取快照，发送过程中连接表可能被修改
+        connections = list(self.active_connections.items())
         
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(message)
-            except Exception:
-                disconnected_clients.add(client_id)
+        # 并发发送给所有客户端
+        results = await asyncio.gather(
+            *(websocket.send_text(message) for _, websocket in connections),
+            return_exceptions=True
+        )
         
         # 清理断开的连接
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
+        for (client_id, _), result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(client_id)
     
     def get_active_connections_count(self) -> int:
         """获取活动连接数"""
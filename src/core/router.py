@@ -2,178 +2,257 @@
 路由模块
 负责请求的模型选择和转发处理
 """
-from typing import Dict, Any, AsyncGenerator, Optional, Tuple
+from typing import Dict, Any, AsyncGenerator, NamedTuple, NoReturn, Optional, Tuple, Type
 import aiohttp
 import time
-import json
+import orjson
 import asyncio
-from datetime import datetime, timedelta
+from functools import lru_cache
 from infrastructure.config import Config
-from infrastructure.logging import logger
+from infrastructure import logging as log
 from adapters.base import ModelAdapter
 from adapters.openai import OpenAIAdapter
 from adapters.gemini import GeminiAdapter
 
+# 适配器类型名称到适配器类的映射
+_ADAPTER_CLASSES: Dict[str, Type[ModelAdapter]] = {
+    "openai": OpenAIAdapter,
+    "gemini": GeminiAdapter
+}
+
+# 每种适配器类型的共享实例，首次使用时创建
+_ADAPTER_SINGLETONS: Dict[str, ModelAdapter] = {}
+
+@lru_cache(maxsize=4096)
+def _parse_model_name(model: str) -> Tuple[str, str]:
+    """解析模型名称，返回(provider_name, model_name)元组
+    
+    同一模型名称会被反复请求，解析结果按名称缓存
+    
+    Args:
+        model: 模型名称，格式为 "provider/model" 或 "model"
+              model 部分可能包含参数标注，如 "model<param>"
+              
+    Returns:
+        Tuple[str, str]: (provider_name, model_name) 元组
+    """
+    # 删除模型名称中的参数标注
+    def clean_model_name(name: str) -> str:
+        if "<" in name and ">" in name:
+            # 找到最后一个 < 和第一个 > 之间的内容
+            start = name.rfind("<")
+            end = name.find(">", start)
+            if start != -1 and end != -1:
+                return name[:start] + name[end + 1:]
+        return name
+        
+    provider, sep, model_name = model.partition("/")
+    if sep:
+        return provider, clean_model_name(model_name)
+    # 默认使用 closeai
+    return "closeai", clean_model_name(model)
+
+class ProviderPlan(NamedTuple):
+    """单个 (提供商, 模型) 组合转发请求所需的配置，按配置版本缓存"""
+    provider_config: Dict[str, Any]
+    model_config: Dict[str, Any]
+    base_url: str
+    api_key: str
+    proxy: Optional[str]
+    # 非流式请求的超时设置，流式请求使用 _STREAM_TIMEOUT
+    timeout: aiohttp.ClientTimeout
+    # 上游流式响应已是OpenAI格式，无需经过适配器解析
+    passthrough: bool
+
+def _mk_timeout(model_config: Optional[Dict[str, Any]]) -> aiohttp.ClientTimeout:
+    """根据模型配置生成非流式请求的超时设置，保留连接和读取的分项超时"""
+    return aiohttp.ClientTimeout(
+        total=(model_config or {}).get("timeout", 120),
+        connect=30,   # 连接超时 30 秒，包括等待连接池中的空闲连接
+        sock_read=180 # 读取超时 3 分钟
+    )
+
+# 流式请求不限制总时长，仍在输出内容的流不会被中断，
+# 上游长时间没有数据时由读取超时结束
+_STREAM_TIMEOUT = aiohttp.ClientTimeout(
+    total=None,
+    connect=30,   # 连接超时 30 秒，包括等待连接池中的空闲连接
+    sock_read=180 # 读取超时 3 分钟
+)
+
 class Router:
     """请求路由器"""
     
     def __init__(self):
         self.config = Config()
-        self.session: Optional[aiohttp.ClientSession] = None
-        # 适配器实例缓存，key为 "{provider}:{model}"
-        self.adapter_instances: Dict[str, Tuple[ModelAdapter, datetime]] = {}
-        # 适配器创建锁
-        self.adapter_locks: Dict[str, asyncio.Lock] = {}
-        # 实例过期时间（分钟）
-        self.instance_ttl = 30
-        # 启动清理任务
-        asyncio.create_task(self._cleanup_expired_instances())
-    
-    async def _cleanup_expired_instances(self):
-        """定期清理过期的适配器实例"""
-        while True:
-            try:
-                current_time = datetime.now()
-                # 找出过期的实例
-                expired_keys = [
-                    key for key, (_, last_used) in self.adapter_instances.items()
-                    if current_time - last_used > timedelta(minutes=self.instance_ttl)
-                ]
-                
-                # 移除过期实例
-                for key in expired_keys:
-                    del self.adapter_instances[key]
-                    if key in self.adapter_locks:
-                        del self.adapter_locks[key]
-                
-                # 每5分钟检查一次
-                await asyncio.sleep(300)
-            except Exception as e:
-                logger.error(f"Error in cleanup task: {str(e)}")
-                await asyncio.sleep(60)  # 出错时等待1分钟后重试
+        # 按提供商划分的HTTP会话，key为提供商名称
+        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+        # 转发计划缓存，key为 (provider, model_name)，只缓存已配置的组合
+        self._plans: Dict[Tuple[str, str], ProviderPlan] = {}
+        self._plans_version = self.config.version
+        # 模型列表缓存，(配置版本, 模型列表, 序列化后的JSON)
+        self._models_cache: Optional[Tuple[int, Dict[str, Any], bytes]] = None
     
     async def get_adapter(self, provider: str, model: str) -> ModelAdapter:
-        """获取或创建适配器实例"""
-        instance_key = f"{provider}:{model}"
-        
-        # 检查缓存的实例
-        if instance_key in self.adapter_instances:
-            adapter, _ = self.adapter_instances[instance_key]
-            # 更新最后使用时间
-            self.adapter_instances[instance_key] = (adapter, datetime.now())
-            return adapter
+        """获取适配器实例
         
-        # 获取创建锁
-        if instance_key not in self.adapter_locks:
-            self.adapter_locks[instance_key] = asyncio.Lock()
+        适配器不保存请求状态，同一适配器类型在进程内共用一个实例
+        """
+        # 获取适配器类型
+        adapter_type = self.config.get_provider_adapter(provider)
+        if not adapter_type:
+            raise ValueError(f"No adapter type configured for provider: {provider}")
         
-        async with self.adapter_locks[instance_key]:
-            # 二次检查，防止并发创建
-            if instance_key in self.adapter_instances:
-                adapter, _ = self.adapter_instances[instance_key]
-                self.adapter_instances[instance_key] = (adapter, datetime.now())
-                return adapter
-            
-            # 获取适配器类型
-            adapter_type = self.config.get_provider_adapter(provider)
-            if not adapter_type:
-                raise ValueError(f"No adapter type configured for provider: {provider}")
-            
-            # 创建新实例
-            adapter_classes = {
-                "openai": OpenAIAdapter,
-                "gemini": GeminiAdapter
-            }
-            
-            if adapter_type not in adapter_classes:
+        adapter = _ADAPTER_SINGLETONS.get(adapter_type)
+        if adapter is None:
+            adapter_class = _ADAPTER_CLASSES.get(adapter_type)
+            if adapter_class is None:
                 raise ValueError(f"Unknown adapter type: {adapter_type}")
-            
-            adapter = adapter_classes[adapter_type]()
-            self.adapter_instances[instance_key] = (adapter, datetime.now())
-            return adapter
+            adapter = _ADAPTER_SINGLETONS[adapter_type] = adapter_class()
+        return adapter
     
-    async def get_session(self) -> aiohttp.ClientSession:
-        """获取或创建HTTP会话"""
-        if self.session is None or self.session.closed:
-            timeout = aiohttp.ClientTimeout(
-                total=600,    # 总超时时间 10 分钟
-                connect=30,   # 连接超时 30 秒
-                sock_read=180 # 读取超时 3 分钟
+    async def get_session(
+        self,
+        provider: str,
+        provider_config: Dict[str, Any]
+    ) -> aiohttp.ClientSession:
+        """获取或创建提供商专用的HTTP会话
+        
+        每个提供商使用独立的连接池，一个上游变慢时不会占满其他上游的连接
+        """
+        session = self.sessions.get(provider)
+        if session is None or session.closed:
+            # 每个会话只连接一个上游主机，连接数上限可在提供商配置中调整
+            max_connections = provider_config.get("max_connections", 128)
+            connector = aiohttp.TCPConnector(
+                limit=max_connections,           # 总连接数上限
+                limit_per_host=max_connections,  # 单个上游主机的连接数上限
+                ttl_dns_cache=300,          # DNS 缓存 5 分钟
+                # 空闲连接保持 15 秒，短于上游的空闲断开时间，
+                # 避免复用已被对端关闭的连接而出现 EOF 错误
+                keepalive_timeout=15,
+                enable_cleanup_closed=True  # 清理未正常关闭的 TLS 连接
+            )
+            # 超时由每个请求单独传入，不设置会话级超时
+            session = aiohttp.ClientSession(
+                connector=connector,
+                # 不同上游之间不共享 Cookie
+                cookie_jar=aiohttp.DummyCookieJar(),
+                # 读缓冲 4MB，大的 SSE 帧不会被切成大量小块，
+                # 也避免单行超出缓冲时的 "Chunk too big" 错误
+                read_bufsize=4 * 1024 * 1024
             )
-            self.session = aiohttp.ClientSession(timeout=timeout)
-        return self.session
+            self.sessions[provider] = session
+        return session
     
     def _parse_model_name(self, model: str) -> Tuple[str, str]:
-        """解析模型名称，返回(provider_name, model_name)元组
+        """解析模型名称，返回(provider_name, model_name)元组"""
+        return _parse_model_name(model)
+    
+    def _reject(
+        self,
+        provider: str,
+        model: str,
+        status_code: int,
+        error_type: Type[Exception],
+        message: str
+    ) -> NoReturn:
+        """记录请求错误并抛出对应的异常
         
         Args:
-            model: 模型名称，格式为 "provider/model" 或 "model"
-                  model 部分可能包含参数标注，如 "model<param>"
-                  
-        Returns:
-            Tuple[str, str]: (provider_name, model_name) 元组
+            provider: 提供商名称
+            model: 请求中的模型名称
+            status_code: 记录到日志中的HTTP状态码
+            error_type: 要抛出的异常类型
+            message: 错误信息
         """
-        # 删除模型名称中的参数标注
-        def clean_model_name(name: str) -> str:
-            if "<" in name and ">" in name:
-                # 找到最后一个 < 和第一个 > 之间的内容
-                start = name.rfind("<")
-                end = name.find(">", start)
-                if start != -1 and end != -1:
-                    return name[:start] + name[end + 1:]
-            return name
-            
-        if "/" in model:
-            provider, model_name = model.split("/", 1)
-            return provider, clean_model_name(model_name)
-        # 默认使用 closeai
-        return "closeai", clean_model_name(model)
+        log.logger.log_request_error(
+            provider=provider,
+            model=model,
+            status_code=status_code,
+            error_message=message
+        )
+        raise error_type(message)
+    
+    def _get_plan(self, provider: str, model_name: str) -> Optional[ProviderPlan]:
+        """获取转发计划，提供商未配置或模型不支持时返回 None
+        
+        配置重新加载后（版本号变化）清空缓存并重新构建
+        """
+        if self._plans_version != self.config.version:
+            self._plans.clear()
+            self._plans_version = self.config.version
+        
+        key = (provider, model_name)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+        
+        provider_config = self.config.get_provider_config(provider)
+        if not provider_config or not self.config.is_model_supported(provider, model_name):
+            return None
+        
+        model_config = self.config.get_model_config(provider, model_name)
+        plan = ProviderPlan(
+            provider_config=provider_config,
+            model_config=model_config,
+            base_url=provider_config["base_url"],
+            # 未配置密钥时仍然转发，由上游返回鉴权错误
+            api_key=provider_config.get("api_key", ""),
+            proxy=self.config.get_proxy(provider_config.get("requires_proxy", False)),
+            timeout=_mk_timeout(model_config),
+            passthrough=self._use_passthrough(provider, model_name, model_config)
+        )
+        self._plans[key] = plan
+        return plan
+    
+    def _use_passthrough(
+        self,
+        provider: str,
+        model_name: str,
+        model_config: Optional[Dict[str, Any]]
+    ) -> bool:
+        """判断流式响应是否原样转发
+        
+        只有使用 openai 适配器的提供商，上游输出才已经是OpenAI格式，
+        其他适配器上配置的 passthrough 会被忽略
+        """
+        if not (model_config or {}).get("passthrough", False):
+            return False
+        if self.config.get_provider_adapter(provider) != "openai":
+            log.logger.logger.warning(
+                f"Ignoring passthrough for {provider}/{model_name}: "
+                f"only supported with the openai adapter"
+            )
+            return False
+        return True
     
     async def _validate_request(
         self,
         model: str,
         api_key: str,
         payload: Dict[str, Any]
-    ) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
-        """验证请求参数并返回必要的配置信息"""
+    ) -> Tuple[str, str, ProviderPlan]:
+        """验证请求参数并返回必要的配置信息
+        
+        Returns:
+            Tuple[str, str, ProviderPlan]: (provider, model_name, plan) 元组
+        """
         # 验证API密钥
         if not self.config.validate_api_key(api_key):
-            logger.log_request_error(
-                provider="unknown",
-                model=model,
-                status_code=401,
-                error_message="Invalid API key"
-            )
-            raise PermissionError("Invalid API key")
+            self._reject("unknown", model, 401, PermissionError, "Invalid API key")
         
         # 解析模型名称
         provider, model_name = self._parse_model_name(model)
         
-        # 获取提供商配置
-        provider_config = self.config.get_provider_config(provider)
-        if not provider_config:
-            logger.log_request_error(
-                provider=provider,
-                model=model,
-                status_code=400,
-                error_message=f"Provider not configured: {provider}"
-            )
-            raise ValueError(f"Provider not configured: {provider}")
+        plan = self._get_plan(provider, model_name)
+        if plan is None:
+            # 只有校验失败时才区分具体原因
+            if not self.config.get_provider_config(provider):
+                self._reject(provider, model, 400, ValueError, f"Provider not configured: {provider}")
+            self._reject(provider, model, 400, ValueError, f"Model not supported: {model_name}")
         
-        # 验证模型是否支持
-        if not self.config.is_model_supported(provider, model_name):
-            logger.log_request_error(
-                provider=provider,
-                model=model,
-                status_code=400,
-                error_message=f"Model not supported: {model_name}"
-            )
-            raise ValueError(f"Model not supported: {model_name}")
-        
-        # 获取模型配置
-        model_config = self.config.get_model_config(provider, model_name)
-        
-        return provider, provider_config, model_config
+        return provider, model_name, plan
     
     async def route_request(
         self,
@@ -185,40 +264,41 @@ class Router:
         if payload.get("stream", False):
             raise ValueError("Use route_request_stream for streaming requests")
         
-        provider, provider_config, model_config = await self._validate_request(model, api_key, payload)
-        _, model_name = self._parse_model_name(model)
+        provider, model_name, plan = await self._validate_request(
+            model, api_key, payload
+        )
         
         # 获取适配器实例
         adapter = await self.get_adapter(provider, model_name)
         
         # 准备请求参数
+        # 其他参数原样透传，后面的键覆盖请求中的同名参数
         request_params = {
+            **payload,
             "messages": payload.get("messages", []),
             "model": model_name,
             "temperature": payload.get("temperature"),
             "stream": False,
-            "_model_config": model_config  # 传递模型配置
+            "_model_config": plan.model_config  # 传递模型配置
         }
-        # 添加其他参数，但排除已经设置的
-        other_params = {k: v for k, v in payload.items()
-                       if k not in request_params}
-        request_params.update(other_params)
         
         request_data = await adapter.prepare_request(**request_params)
         
         try:
-            session = await self.get_session()
+            session = await self.get_session(provider, plan.provider_config)
             async with session.post(
-                provider_config["base_url"],
-                json=request_data,
-                headers=adapter.get_headers(provider_config["api_key"]),
-                proxy=self.config.get_proxy(provider_config["requires_proxy"])
+                plan.base_url,
+                # 请求体直接用 orjson 序列化为字节，Content-Type 已在请求头中设置
+                data=orjson.dumps(request_data),
+                headers=adapter.get_headers(plan.api_key),
+                proxy=plan.proxy,
+                timeout=plan.timeout
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise RuntimeError(f"API error: {response.status} - {error_text}")
                 
-                response_data = await response.json()
+                response_data = orjson.loads(await response.read())
                 return await adapter.process_response(response_data)
                 
         except Exception as e:
@@ -232,76 +312,103 @@ class Router:
         model: str,
         api_key: str,
         payload: Dict[str, Any]
-    ) -> AsyncGenerator[str, None]:
-        """处理流式请求"""
-        provider, provider_config, model_config = await self._validate_request(model, api_key, payload)
-        _, model_name = self._parse_model_name(model)
+    ) -> AsyncGenerator[bytes, None]:
+        """处理流式请求，输出已编码的SSE数据"""
+        provider, model_name, plan = await self._validate_request(
+            model, api_key, payload
+        )
         
         # 获取适配器实例
         adapter = await self.get_adapter(provider, model_name)
         
         # 准备请求参数
+        # 其他参数原样透传，后面的键覆盖请求中的同名参数
         request_params = {
+            **payload,
             "messages": payload.get("messages", []),
             "model": model_name,
             "temperature": payload.get("temperature"),
             "stream": True,
-            "_model_config": model_config  # 传递模型配置
+            "_model_config": plan.model_config  # 传递模型配置
         }
-        # 添加其他参数，但排除已经设置的
-        other_params = {k: v for k, v in payload.items()
-                       if k not in request_params}
-        request_params.update(other_params)
         
         request_data = await adapter.prepare_request(**request_params)
         
         try:
-            session = await self.get_session()
+            session = await self.get_session(provider, plan.provider_config)
             async with session.post(
-                provider_config["base_url"],
-                json=request_data,
-                headers=adapter.get_headers(provider_config["api_key"]),
-                proxy=self.config.get_proxy(provider_config["requires_proxy"])
+                plan.base_url,
+                # 请求体直接用 orjson 序列化为字节，Content-Type 已在请求头中设置
+                data=orjson.dumps(request_data),
+                headers=adapter.get_headers(plan.api_key),
+                proxy=plan.proxy,
+                timeout=_STREAM_TIMEOUT
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise RuntimeError(f"API error: {response.status} - {error_text}")
                 
-                async for chunk in adapter.process_stream(response.content):
-                    yield chunk
+                if plan.passthrough:
+                    # 逐个事件原样转发，只丢弃空行和注释行，不解析JSON；
+                    # "data:" 后的空格可有可无，统一规范为 "data: "
+                    async for line in response.content:
+                        if line.startswith(b"data:"):
+                            data = line[5:].strip()
+                            yield b"data: " + data + b"\n\n"
+                else:
+                    async for chunk in adapter.process_stream(response.content):
+                        yield chunk
                     
         except Exception as e:
+            # 错误已经以数据帧的形式发给客户端，记录后正常结束流，不再向外抛出
+            log.logger.log_request_error(
+                provider=provider,
+                model=model,
+                status_code=500,
+                error_message=str(e)
+            )
             error_response = await adapter.handle_error(e)
             if isinstance(error_response, dict) and "error" in error_response:
-                yield f"data: {json.dumps(error_response)}\n\n"
+                yield b"data: " + orjson.dumps(error_response) + b"\n\n"
             else:
-                yield f"data: {json.dumps({'error': {'message': str(e)}})}\n\n"
-            yield "data: [DONE]\n\n"
-            raise RuntimeError(str(e))
+                yield b"data: " + orjson.dumps({"error": {"message": str(e)}}) + b"\n\n"
+            yield b"data: [DONE]\n\n"
+    
+    def _get_models_cache(self) -> Tuple[int, Dict[str, Any], bytes]:
+        """获取模型列表缓存，配置版本变化时重新构建"""
+        cached = self._models_cache
+        if cached is None or cached[0] != self.config.version:
+            created = int(time.time())
+            models = {
+                "object": "list",
+                "data": [
+                    {
+                        "id": f"{provider}/{model}",
+                        "object": "model",
+                        "created": created,
+                        "owned_by": provider
+                    }
+                    for provider, config in self.config.get_all_providers().items()
+                    for model in config.get("models", {})
+                ]
+            }
+            cached = (self.config.version, models, orjson.dumps(models))
+            self._models_cache = cached
+        return cached
     
     async def list_models(self) -> Dict[str, Any]:
-        """获取可用模型列表"""
-        models_list = []
-        current_time = int(time.time())
-        
-        for provider, config in self.config.get_all_providers().items():
-            for model in config.get("models", {}).keys():
-                model_id = f"{provider}/{model}"
-                model_obj = {
-                    "id": model_id,
-                    "object": "model",
-                    "created": current_time,
-                    "owned_by": provider
-                }
-                models_list.append(model_obj)
-        
-        return {
-            "object": "list",
-            "data": models_list
-        }
+        """获取可用模型列表，配置未变化时复用已构建的结果"""
+        return self._get_models_cache()[1]
+    
+    async def list_models_json(self) -> bytes:
+        """获取已序列化的模型列表JSON，可直接作为响应体返回"""
+        return self._get_models_cache()[2]
     
     async def close(self):
         """关闭资源"""
-        if self.session and not self.session.closed:
-            await self.session.close()
-            self.session = None
\ No newline at end of file
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(
+            *(session.close() for session in sessions if not session.closed),
+            return_exceptions=True
+        )
\ No newline at end of file
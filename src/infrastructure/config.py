@@ -2,59 +2,96 @@
 配置管理模块
 负责加载和管理配置信息，支持热更新
 """
+import hashlib
 import os
+import secrets
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, FrozenSet, Optional, Tuple
 from dotenv import load_dotenv
 import yaml
 import json
 
+# 优先使用 libyaml 提供的C实现解析器，不可用时退回纯Python实现
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# 环境变量在进程内只需解析一次，多个 Config 实例共享
+load_dotenv()
+
+# 访问密钥摘要使用的进程内随机密钥，摘要不会出现在进程之外
+_API_KEY_PEPPER = secrets.token_bytes(16)
+
+def _digest_api_key(api_key: str) -> bytes:
+    """计算访问密钥的定长摘要，校验时只比较摘要，耗时与密钥内容无关"""
+    return hashlib.blake2b(api_key.encode(), digest_size=16, key=_API_KEY_PEPPER).digest()
+
+# 已解析的配置文件缓存，key为文件路径，value为 (st_mtime_ns, 配置字典)
+_config_cache: Dict[Path, Tuple[int, Dict[str, Any]]] = {}
+
 class Config:
     """配置管理器"""
     
     def __init__(self):
-        # 加载环境变量
-        load_dotenv()
-        
         # 获取项目根目录
         current_file = Path(__file__).resolve()
         self.project_root = current_file.parents[2]  # src/infrastructure/config.py -> src/infrastructure -> src -> root
         
+        # 配置版本号，每次重新加载后递增，供依赖配置的缓存判断是否失效
+        self.version = 0
+        
         # 加载配置文件
         self.config_path = self.project_root / "configs" / "config.yaml"
         self.config = self._load_config()
         
         # 从环境变量加载API密钥
-        self.api_keys = self._load_api_keys()
+        self.api_key_digests = self._load_api_keys()
         
         # 更新提供商API密钥
         self._update_provider_api_keys()
+        
+        # 构建查找表
+        self._build_lookup_tables()
     
     def _load_config(self) -> Dict[str, Any]:
-        """加载YAML配置文件"""
+        """加载YAML配置文件，文件未修改时直接复用已解析的结果"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            mtime = os.stat(self.config_path).st_mtime_ns
+            cached = _config_cache.get(self.config_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
+            # 一次性读入整个文件，避免解析器按块多次读取
+            config = yaml.load(self.config_path.read_bytes(), Loader=SafeLoader)
+            _config_cache[self.config_path] = (mtime, config)
+            return config
         except Exception as e:
             raise RuntimeError(f"Failed to load config file: {str(e)}")
     
-    def _load_api_keys(self) -> Dict[str, str]:
-        """从环境变量加载API密钥"""
-        api_keys = {}
+    def _load_api_keys(self) -> FrozenSet[bytes]:
+        """从环境变量加载API密钥
         
+        支持JSON格式（对象的键或数组的元素）和逗号分隔两种写法，
+        只保存各密钥的摘要，用于成员判断
+        """
         # 加载访问密钥
         access_keys_str = os.getenv("ACCESS_API_KEYS", "")
-        if access_keys_str:
-            try:
-                # 尝试解析为JSON
-                api_keys = json.loads(access_keys_str)
-            except json.JSONDecodeError:
-                # 如果不是JSON格式，按逗号分隔
-                # 使用密钥作为键和值
-                keys = [key.strip() for key in access_keys_str.split(",") if key.strip()]
-                api_keys = {key: True for key in keys}
+        if not access_keys_str:
+            return frozenset()
+        
+        try:
+            # 尝试解析为JSON
+            keys = json.loads(access_keys_str)
+        except json.JSONDecodeError:
+            keys = None
+        if isinstance(keys, (dict, list)):
+            return frozenset(_digest_api_key(str(key)) for key in keys)
         
-        return api_keys
+        # 如果不是JSON对象或数组，按逗号分隔
+        return frozenset(
+            _digest_api_key(key.strip()) for key in access_keys_str.split(",") if key.strip()
+        )
     
     def _update_provider_api_keys(self):
         """从环境变量更新提供商API密钥"""
@@ -64,19 +101,39 @@ class Config:
             if api_key:
                 self.config["providers"][provider]["api_key"] = api_key
     
+    def _build_lookup_tables(self):
+        """将嵌套的提供商配置展开为扁平的查找表
+        
+        请求处理中的配置查询只需一次字典查找，配置加载时构建一次
+        """
+        providers = self.config.get("providers", {})
+        self._provider_cfg: Dict[str, Dict[str, Any]] = dict(providers)
+        self._adapters: Dict[str, Optional[str]] = {
+            name: provider.get("adapter") for name, provider in providers.items()
+        }
+        self._model_cfg: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {
+            (name, model): model_config
+            for name, provider in providers.items()
+            for model, model_config in provider.get("models", {}).items()
+        }
+        # 代理地址在每个请求中都会用到，加载配置时取出一次
+        self._https_proxy = self.config.get("proxy", {}).get("https")
+    
     def reload(self):
         """重新加载配置"""
+        self.version += 1
         self.config = self._load_config()
-        self.api_keys = self._load_api_keys()
+        self.api_key_digests = self._load_api_keys()
         self._update_provider_api_keys()
+        self._build_lookup_tables()
     
     def validate_api_key(self, api_key: str) -> bool:
         """验证API密钥"""
-        return api_key in self.api_keys
+        return _digest_api_key(api_key) in self.api_key_digests
     
     def get_provider_config(self, provider: str) -> Optional[Dict[str, Any]]:
         """获取提供商配置"""
-        return self.config.get("providers", {}).get(provider)
+        return self._provider_cfg.get(provider)
     
     def get_model_config(self, provider: str, model: str) -> Optional[Dict[str, Any]]:
         """获取模型配置
@@ -86,10 +143,9 @@ class Config:
         Returns:
             Dict[str, Any]: 模型配置，如果未找到返回 None
         """
-        provider_config = self.get_provider_config(provider)
-        if not provider_config:
+        if not self._provider_cfg.get(provider):
             return None
-        return provider_config.get("models", {}).get(model, {})
+        return self._model_cfg.get((provider, model), {})
     
     def get_provider_adapter(self, provider: str) -> Optional[str]:
         """获取提供商的适配器名称
@@ -98,25 +154,15 @@ class Config:
         Returns:
             str: 适配器名称，如果未找到返回 None
         """
-        provider_config = self.get_provider_config(provider)
-        if not provider_config:
-            return None
-        return provider_config.get("adapter")
+        return self._adapters.get(provider)
     
     def is_model_supported(self, provider: str, model: str) -> bool:
         """检查模型是否支持"""
-        provider_config = self.get_provider_config(provider)
-        if not provider_config:
-            return False
-        models = provider_config.get("models", {})
-        # 现在模型是一个字典，其中包含配置信息
-        return model in models.keys()
+        return (provider, model) in self._model_cfg
     
     def get_proxy(self, requires_proxy: bool) -> Optional[str]:
         """获取代理配置"""
-        if not requires_proxy:
-            return None
-        return self.config.get("proxy", {}).get("https")
+        return self._https_proxy if requires_proxy else None
     
     def get_all_providers(self) -> Dict[str, Any]:
         """获取所有提供商配置"""
@@ -3,24 +3,75 @@
 提供结构化日志记录功能，支持JSON格式输出
 """
 import logging
-from logging.handlers import RotatingFileHandler
-import json
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
+import orjson
 import os
-from datetime import datetime
+import queue
+import threading
+import time
 from typing import Dict, Any, Optional, Union
 from .config import Config
 
+# 可能很大的请求/响应内容字段，按配置截断后再记录
+_PAYLOAD_FIELDS = frozenset({"messages", "response"})
+
+def _truncate(value: Any, max_chars: int) -> str:
+    """将日志内容限制在指定长度内
+    
+    非字符串内容序列化为JSON文本，只序列化这一次，字段类型始终为字符串；
+    超出长度时保留开头和结尾，并注明省略的字符数
+    """
+    text = value if isinstance(value, str) else orjson.dumps(value).decode()
+    if len(text) <= max_chars:
+        return text
+    head = max_chars // 2
+    tail = max_chars - head
+    return f"{text[:head]}…<{len(text) - max_chars} chars omitted>…{text[len(text) - tail:]}"
+
 class JsonFormatter(logging.Formatter):
     """JSON格式的日志格式化器"""
     
+    def __init__(self):
+        super().__init__()
+        # 同一秒内的日志共用格式化好的日期时间部分，只需拼接微秒
+        self._cached_second: Optional[int] = None
+        self._cached_prefix = ""
+    
+    def _format_timestamp(self, created: float) -> str:
+        """将日志记录的创建时间格式化为ISO格式的本地时间"""
+        second = int(created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+        return f"{self._cached_prefix}.{int((created - second) * 1_000_000):06d}"
+    
     def format(self, record: logging.LogRecord) -> str:
-        """格式化日志记录"""
+        """格式化日志记录
+        
+        结构化日志的数据通过 extra 中的 payload 传入，与时间、级别合并后只序列化一次
+        """
         log_data = {
-            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
-            "level": record.levelname,
-            "message": record.getMessage()
+            "timestamp": self._format_timestamp(record.created),
+            "level": record.levelname
         }
-        return json.dumps(log_data, ensure_ascii=False)
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            log_data.update(payload)
+        else:
+            log_data["message"] = record.getMessage()
+        # orjson 直接输出UTF-8，不转义非ASCII字符
+        return orjson.dumps(log_data).decode()
+
+class TextFormatter(logging.Formatter):
+    """文本格式的日志格式化器，结构化日志的数据序列化为JSON后作为消息输出"""
+    
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """格式化日志消息"""
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            record.message = orjson.dumps(payload).decode()
+        return super().formatMessage(record)
 
 class StructuredLogger:
     """结构化日志记录器"""
@@ -29,6 +80,19 @@ class StructuredLogger:
         self.config = Config()
         self.logger = logging.getLogger("LLM_Bridge")
         self._setup_logger()
+        
+        # 预先计算需要记录的字段，避免每条日志都遍历配置
+        self._fields_config: Dict[str, bool] = self.config.get_logging_config().get("fields", {})
+        self._field_keys = tuple(
+            field for field, enabled in self._fields_config.items() if enabled
+        )
+        # 请求/响应内容的最大记录长度（字符），未配置或为0时完整记录
+        self._max_payload_chars: int = self.config.get_logging_config().get("max_payload_chars", 0)
+        
+        # 日志级别在初始化后不再变化，未启用调试级别时
+        # 直接把逐块记录替换为空操作，流式热路径上不做任何判断
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            self.log_chunk = lambda *args, **kwargs: None
     
     def _setup_logger(self):
         """配置日志记录器"""
@@ -41,6 +105,7 @@ class StructuredLogger:
         
         # 获取日志配置
         log_config = self.config.get_logging_config()
+        handlers = []
         
         # 配置文件输出
         if "output" in log_config and "file" in log_config["output"]:
@@ -59,20 +124,41 @@ class StructuredLogger:
                 encoding='utf-8'
             )
             file_handler.setFormatter(self._get_formatter())
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
         
         # 配置控制台输出
         if log_config.get("output", {}).get("console", True):
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(self._get_formatter())
-            self.logger.addHandler(console_handler)
+            handlers.append(console_handler)
+        
+        # 实际的格式化和写入由后台线程完成，请求处理中只需将记录放入队列
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(QueueHandler(log_queue))
+        self._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._listener_running = False
+        # 立即启动，服务之外的脚本也能正常输出日志；服务的启动和关闭事件会再次管理
+        self.start()
+        atexit.register(self.stop)
+    
+    def start(self):
+        """启动后台日志线程，已在运行时不做任何操作"""
+        if not self._listener_running:
+            self._listener.start()
+            self._listener_running = True
+    
+    def stop(self):
+        """停止后台日志线程，等待队列中已有的日志全部写出"""
+        if self._listener_running:
+            self._listener.stop()
+            self._listener_running = False
     
     def _get_formatter(self) -> logging.Formatter:
         """获取日志格式化器"""
         if self.config.log_format == "json":
             return JsonFormatter()
         else:
-            return logging.Formatter(
+            return TextFormatter(
                 "%(asctime)s [%(levelname)s] %(message)s",
                 datefmt="%Y-%m-%d %H:%M:%S"
             )
@@ -83,20 +169,24 @@ class StructuredLogger:
         data: Dict[str, Any],
         include_fields: Optional[Dict[str, bool]] = None
     ) -> Dict[str, Any]:
-        """格式化日志数据"""
-        log_data = {
-            "timestamp": datetime.now().isoformat(),
-            "event": event
-        }
+        """格式化日志数据，时间由格式化器根据日志记录的创建时间添加"""
+        log_data = {"event": event}
         
         # 根据配置添加字段
-        fields_config = self.config.get_logging_config().get("fields", {})
+        field_keys = self._field_keys
         if include_fields:
-            fields_config.update(include_fields)
+            fields_config = {**self._fields_config, **include_fields}
+            field_keys = tuple(
+                field for field, enabled in fields_config.items() if enabled
+            )
         
-        for field, enabled in fields_config.items():
-            if enabled and field in data:
-                log_data[field] = data[field]
+        max_chars = self._max_payload_chars
+        for field in field_keys:
+            if field in data:
+                value = data[field]
+                if max_chars and field in _PAYLOAD_FIELDS and value is not None:
+                    value = _truncate(value, max_chars)
+                log_data[field] = value
         
         return log_data
     
@@ -109,6 +199,9 @@ class StructuredLogger:
         input_tokens: Optional[int] = None
     ):
         """记录请求开始"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+            
         log_data = self._format_log(
             "request_start",
             {
@@ -119,7 +212,7 @@ class StructuredLogger:
                 "messages": messages
             }
         )
-        self.logger.info(json.dumps(log_data, ensure_ascii=False))
+        self.logger.info("", extra={"payload": log_data})
     
     def log_request_complete(
         self,
@@ -134,6 +227,9 @@ class StructuredLogger:
         is_stream: bool = False
     ):
         """记录请求完成"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+            
         log_data = self._format_log(
             "request_complete",
             {
@@ -148,7 +244,7 @@ class StructuredLogger:
                 "response": response
             }
         )
-        self.logger.info(json.dumps(log_data, ensure_ascii=False))
+        self.logger.info("", extra={"payload": log_data})
     
     def log_request_error(
         self,
@@ -159,6 +255,9 @@ class StructuredLogger:
         messages: Optional[list] = None
     ):
         """记录请求错误"""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+            
         log_data = self._format_log(
             "request_error",
             {
@@ -169,7 +268,7 @@ class StructuredLogger:
                 "messages": messages
             }
         )
-        self.logger.error(json.dumps(log_data, ensure_ascii=False))
+        self.logger.error("", extra={"payload": log_data})
     
     def log_chunk(
         self,
@@ -179,7 +278,7 @@ class StructuredLogger:
         state: str = "received"
     ):
         """记录流式响应的chunk"""
-        if self.logger.level > logging.DEBUG:
+        if not self.logger.isEnabledFor(logging.DEBUG):
             return
             
         log_data = self._format_log(
@@ -190,7 +289,29 @@ class StructuredLogger:
                 "chunk": chunk
             }
         )
-        self.logger.debug(json.dumps(log_data, ensure_ascii=False))
+        self.logger.debug("", extra={"payload": log_data})
 
-# 创建全局日志实例
-logger = StructuredLogger()
\ No newline at end of file
+# 全局日志实例，第一次访问 logger 时才创建
+_logger: Optional[StructuredLogger] = None
+_logger_lock = threading.Lock()
+
+def _get_logger() -> StructuredLogger:
+    """获取全局日志实例，多个线程同时首次访问时也只创建一个"""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = StructuredLogger()
+                # 写入模块属性，之后的 log.logger 直接命中模块字典，不再经过 __getattr__
+                globals()["logger"] = _logger
+    return _logger
+
+def __getattr__(name: str) -> Any:
+    """按需创建模块属性 logger（PEP 562）
+    
+    导入 logger 属性本身就会触发创建，因此使用方应导入本模块，
+    在调用时通过 log.logger 访问
+    """
+    if name == "logger":
+        return _get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -3,10 +3,8 @@ LLM Bridge 服务主入口
 提供 HTTP 和 WebSocket API 接口
 """
 from fastapi import FastAPI, Request, WebSocket
-from core.router import Router
-from core.gateway.http_handler import HTTPHandler
-from core.gateway.websocket_handler import WebSocketHandler
-from infrastructure.logging import logger
+from functools import lru_cache
+from infrastructure import logging as log
 import uuid
 
 app = FastAPI(
@@ -15,43 +13,63 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# 初始化组件
-router = Router()
-http_handler = HTTPHandler(router)
-ws_handler = WebSocketHandler(router)
+# 组件在首次使用时才导入和初始化，避免拖慢服务启动
+@lru_cache(maxsize=1)
+def get_router():
+    """获取全局路由器实例"""
+    from core.router import Router
+    return Router()
+
+@lru_cache(maxsize=1)
+def get_http_handler():
+    """获取全局HTTP请求处理器"""
+    from core.gateway.http_handler import HTTPHandler
+    return HTTPHandler(get_router())
+
+@lru_cache(maxsize=1)
+def get_ws_handler():
+    """获取全局WebSocket处理器"""
+    from core.gateway.websocket_handler import WebSocketHandler
+    return WebSocketHandler(get_router())
 
 @app.post("/v1/chat/completions")
 async def chat_completions(request: Request):
     """处理聊天补全请求"""
-    return await http_handler.handle_chat_completion(request)
+    return await get_http_handler().handle_chat_completion(request)
 
 @app.get("/v1/models")
 async def list_models():
     """获取可用模型列表"""
-    return await http_handler.handle_models_list()
+    return await get_http_handler().handle_models_list()
 
 @app.websocket("/v1/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """处理 WebSocket 连接"""
+    ws_handler = get_ws_handler()
     client_id = str(uuid.uuid4())
     await ws_handler.connect(websocket, client_id)
     try:
         await ws_handler.handle_message(websocket, client_id)
     except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
+        log.logger.logger.error(f"WebSocket error: {str(e)}")
     finally:
         ws_handler.disconnect(client_id)
 
 @app.on_event("startup")
 async def startup_event():
     """服务启动时的初始化"""
-    logger.logger.info("LLM Bridge service starting up...")
+    log.logger.start()
+    log.logger.logger.info("LLM Bridge service starting up...")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """服务关闭时的清理"""
-    logger.logger.info("LLM Bridge service shutting down...")
-    await router.close()
+    log.logger.logger.info("LLM Bridge service shutting down...")
+    # 路由器从未被使用时无需创建后再关闭
+    if get_router.cache_info().currsize:
+        await get_router().close()
+    # 最后停止日志线程，确保关闭过程中的日志全部写出
+    log.logger.stop()
 
 if __name__ == "__main__":
     import uvicorn